@@ -1,24 +1,52 @@
 # gatt_profiles.py
-from typing import Optional
+import re
+from functools import lru_cache
+from typing import Dict, Optional
 
 from profiles.zp2_profile import PROFILE as ZP2_PROFILE
 
 
+# 型號 key -> profile（新增型號就在這裡註冊；_MODEL_RE 在 import 時依這張表編好）
+_PROFILES: Dict[str, object] = {
+    ZP2_PROFILE.key: ZP2_PROFILE,
+    # TODO: ZS2
+    # ZS2_PROFILE.key: ZS2_PROFILE,
+}
+
+
+def _compile_model_re() -> "re.Pattern[str]":
+    """
+    Compile all model keys into one alternation（一次線性掃描找出型號）.
+
+    長的 key 放前面，避免 "ZP2" 先吃掉 "ZP2X" 這類前綴重疊的型號。
+    """
+    keys = sorted(_PROFILES, key=len, reverse=True)
+    return re.compile("|".join(map(re.escape, keys)))
+
+
+_MODEL_RE = _compile_model_re()
+
+
+@lru_cache(maxsize=256)
+def _profile_key_for(name_upper: str) -> Optional[str]:
+    """
+    Return the model key matched by an upper-cased ADV name, or None.
+
+    scan 時同一批 ADV name 會反覆出現，所以結果用 lru_cache 快取；
+    回傳 key 字串（hashable），再由 _PROFILES 對回 profile 物件。
+    """
+    m = _MODEL_RE.search(name_upper)
+    return m.group(0) if m else None
+
+
 def get_profile_by_adv_name(name: Optional[str]):
     """
     只用 BLE ADV name 判斷型號
-    - 未來要支援 ZS2 就在這裡加 elif -> return ZS2_PROFILE
+    - 未來要支援 ZS2 就在 _PROFILES 加一筆
     """
     n = (name or "").strip().upper()
     if not n:
         return None
 
-    # ZP2 判斷（未來你要放寬，就改這條）
-    if "ZP2" in n:
-        return ZP2_PROFILE
-
-    # TODO: ZS2
-    # if "ZS2" in n:
-    #     return ZS2_PROFILE
-
-    return None
+    key = _profile_key_for(n)
+    return _PROFILES[key] if key is not None else None
@@ -10,11 +10,27 @@ Profile Store
 - 固定 schema / key 排列，避免資料越存越亂
 """
 
+import asyncio
+import copy
 import json
+import logging
 import os
+import sys
+import threading
 import time
+from dataclasses import asdict, dataclass
 from typing import Any, Dict, List, Optional, Tuple
 
+try:
+    import orjson
+except ImportError:  # 沒裝 orjson 時退回標準庫 json
+    orjson = None  # type: ignore[assignment]
+
+try:
+    import msgpack  # type: ignore[import-untyped]
+except ImportError:  # 選用：只有 PROFILE_FORMAT=msgpack 需要
+    msgpack = None
+
 # ============================================================
 # Banner-style block comments（你偏好的格式）
 # ============================================================
@@ -25,101 +41,505 @@ from typing import Any, Dict, List, Optional, Tuple
 DEFAULT_PROFILE_FILE = "/data/profiles.json"
 SCHEMA_VERSION = 1
 
+# 寫檔格式（env PROFILE_FORMAT）：json（預設）/ msgpack（profile 很多時 encode 較快、檔案較小）
+# 讀檔一律看第一個 byte 判斷格式，切換設定後舊檔照樣讀得到，下一次寫入就換成新格式
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "json").strip().lower() or "json"
+if PROFILE_FORMAT not in ("json", "msgpack"):
+    logging.warning(f"Unknown PROFILE_FORMAT={PROFILE_FORMAT!r}; using json")
+    PROFILE_FORMAT = "json"
+elif PROFILE_FORMAT == "msgpack" and msgpack is None:
+    logging.warning("PROFILE_FORMAT=msgpack but msgpack is not installed; using json")
+    PROFILE_FORMAT = "json"
+
+# mode 只允許這兩個；用 interned 常數，normalize 後所有 Profile 共用同一個字串物件
+MODE_LOCAL = sys.intern("LOCAL")
+MODE_AWS = sys.intern("AWS")
+_MODES: Dict[str, str] = {MODE_LOCAL: MODE_LOCAL, MODE_AWS: MODE_AWS}
+
+# 記憶體快取：path -> (st_mtime_ns, st_size, doc)
+# 檔案沒變就不重新 parse，只花一次 stat()
+_CACHE: Dict[str, Tuple[int, int, Dict[str, Any]]] = {}
+
+# Debounced save：path -> (exported doc, in-memory doc)，由 _FLUSH_TASK 統一寫出
+SAVE_DEBOUNCE_SEC = 0.25
+# 寫檔失敗就留在 pending 重試：間隔從 SAVE_DEBOUNCE_SEC 開始加倍，最多 SAVE_RETRY_MAX_SEC
+SAVE_RETRY_MAX_SEC = 30.0
+_PENDING: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+_FLUSH_TASK: Optional["asyncio.Task[None]"] = None
+# debounced flush 在 worker thread 寫檔；tmp 檔名固定，同一時間只能有一個人在寫
+_WRITE_LOCK = threading.RLock()
+
 
 # ------------------------------------------------------------
 # Utilities
 # ------------------------------------------------------------
+def _s(v: Any) -> str:
+    """
+    Coerce a field value to a stripped str（取代 str(x or "").strip()）.
+
+    常見情況 v 本來就是 str：只做一次 strip；falsy 值一律回 ""。
+    """
+    if type(v) is str:
+        return v.strip()
+    return str(v).strip() if v else ""
+
+
 def _now_ms() -> int:
-    """Return current time in milliseconds (int)."""
-    return int(time.time() * 1000)
+    """Return current time in milliseconds (int, integer-only math)."""
+    return time.time_ns() // 1_000_000
+
+
+def _dumps(data: Any, indent: Optional[int] = None) -> bytes:
+    """
+    Serialize `data` to UTF-8 JSON bytes (orjson when available).
+
+    - indent=None：緊湊格式（預設，寫入 bytes 較少）
+    - indent=2：給人看的 pretty print（orjson 只支援 2 格縮排）
+    """
+    if orjson is not None:
+        option = orjson.OPT_APPEND_NEWLINE
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    text = json.dumps(data, ensure_ascii=False, indent=indent or None,
+                      separators=None if indent else (",", ":"))
+    return (text + "\n").encode("utf-8")
+
+
+def _loads(buf: bytes) -> Any:
+    """Parse UTF-8 JSON bytes (orjson when available)."""
+    if orjson is not None:
+        return orjson.loads(buf)
+    return json.loads(buf)
+
+
+def _fsync_dir(dirpath: str) -> None:
+    """fsync a directory so a preceding rename inside it is persisted."""
+    dfd = os.open(dirpath, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+    try:
+        os.fsync(dfd)
+    finally:
+        os.close(dfd)
+
 
+class MsgpackUnavailableError(Exception):
+    """Raised when a msgpack profiles file is found but msgpack is not installed."""
 
-def _atomic_write_json(path: str, data: Any) -> None:
+
+def _is_msgpack(buf: bytes) -> bool:
     """
-    Atomic write JSON to `path`.
+    Sniff whether `buf` is a MessagePack map rather than JSON text.
+
+    JSON 檔一定是 "{"（或空白）開頭；msgpack map 的第一個 byte 是
+    fixmap 0x80-0x8f / map16 0xde / map32 0xdf。
+    """
+    if not buf:
+        return False
+    b0 = buf[0]
+    return 0x80 <= b0 <= 0x8F or b0 in (0xDE, 0xDF)
+
+
+def _loads_doc(buf: bytes) -> Any:
+    """Parse a profiles file, dispatching on its first byte (JSON / msgpack)."""
+    if _is_msgpack(buf):
+        if msgpack is None:
+            raise MsgpackUnavailableError("profiles file is msgpack but msgpack is not installed")
+        return msgpack.unpackb(buf, raw=False)
+    return _loads(buf)
+
+
+def _atomic_write_bytes(path: str, buf: bytes, *, durable: bool = False) -> None:
+    """
+    Atomic write raw bytes to `path`.
 
     作法：
     1) 寫到同資料夾的 tmp 檔
     2) 使用 os.replace 直接取代（atomic on most filesystems）
+
+    durable=True（config commit 用）：
+    - write -> fsync(tmp) -> rename -> fsync(parent dir)
+    - 沒有 fsync 時 rename 是否真的落盤取決於 OS/FS；預設模式不付這個成本
     """
     tmp = f"{path}.tmp"
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    dirpath = os.path.dirname(path) or "."
+    os.makedirs(dirpath, exist_ok=True)
+
+    if not durable:
+        with open(tmp, "wb") as f:
+            f.write(buf)
+        os.replace(tmp, path)
+        return
+
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(buf)
+        while view:
+            n = os.write(fd, view)
+            view = view[n:]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
     os.replace(tmp, path)
+    _fsync_dir(dirpath)
+
+
+def _encode_doc(out: Dict[str, Any]) -> bytes:
+    """Serialize an exported doc in PROFILE_FORMAT (JSON / msgpack)."""
+    if PROFILE_FORMAT == "msgpack":
+        return msgpack.packb(out, use_bin_type=True)
+    return _dumps(out)
+
+
+def _cache_store(path: str, doc: Dict[str, Any]) -> None:
+    """Remember `doc` as the parsed content of `path` at its current stat（doc 之後不可再被修改）."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        _CACHE.pop(path, None)
+        return
+    _CACHE[path] = (st.st_mtime_ns, st.st_size, doc)
 
 
 def _default_doc() -> Dict[str, Any]:
-    """Return a new default document structure."""
+    """Return a new default (in-memory) document structure."""
     return {
         "schema": SCHEMA_VERSION,
         "current_profile_id": "",
-        "profiles": [],
+        "profiles_by_id": {},
+    }
+
+
+def _index_profiles(profiles: List[Any]) -> Dict[str, "Profile"]:
+    """Build id -> Profile from the on-disk list (first occurrence wins; dropped duplicates are logged)."""
+    by_id: Dict[str, Profile] = {}
+    for p in profiles:
+        if isinstance(p, Profile):
+            prof = p
+        elif isinstance(p, dict):
+            prof = normalize_profile(p)
+        else:
+            continue
+        if prof.id in by_id:
+            logging.warning(f"Duplicate profile id {prof.id!r}: keeping the first entry, dropping name={prof.name!r}")
+            continue
+        by_id[prof.id] = prof
+    return by_id
+
+
+def _needs_migration(profiles: List[Any], by_id: Dict[str, "Profile"]) -> bool:
+    """
+    Whether the on-disk list differs from what normalizing it produced.
+
+    - 有重複 id / 不是 dict 的項目被丟掉
+    - 有 profile 缺 updated_at（或不是 int）：剛被補上「現在時間」，不寫回去的話每次重新 parse 都會換一個
+    """
+    if len(by_id) != len(profiles):
+        return True
+    for p in profiles:
+        if type(p) is dict:
+            ts = p.get("updated_at")
+            if type(ts) is not int or not ts:
+                return True
+    return False
+
+
+def _profiles_by_id(doc: Dict[str, Any]) -> Dict[str, "Profile"]:
+    """
+    Return doc["profiles_by_id"], building it from doc["profiles"] if needed.
+
+    記憶體表示固定用 dict（id -> profile），upsert/delete/lookup 都是一次 hash。
+    """
+    by_id = doc.get("profiles_by_id")
+    if not isinstance(by_id, dict):
+        by_id = _index_profiles(doc.pop("profiles", None) or [])
+        doc["profiles_by_id"] = by_id
+    return by_id
+
+
+def copy_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return a writable copy of an in-memory doc（給要修改 load_profiles 結果的 writer 用）.
+
+    只複製外層 dict 與 profiles_by_id：upsert / delete / select 只會換掉 dict 裡的項目，
+    不會原地改 Profile，所以 Profile 物件可以跟快取共用，不必 deepcopy。
+    """
+    return {
+        "schema": doc.get("schema", SCHEMA_VERSION),
+        "current_profile_id": doc.get("current_profile_id", ""),
+        "profiles_by_id": dict(_profiles_by_id(doc)),
+    }
+
+
+def export_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert an in-memory doc into the JSON schema (profiles as a list).
+
+    save_profiles 與 API 回應都用這份，避免 profiles_by_id 外流。
+    """
+    return {
+        "schema": SCHEMA_VERSION,
+        "current_profile_id": str(doc.get("current_profile_id", "") or ""),
+        "profiles": [asdict(p) for p in _profiles_by_id(doc).values()],
     }
 
 
+def get_profile(doc: Dict[str, Any], pid: str) -> Optional["Profile"]:
+    """Return the profile with id `pid`, or None."""
+    return _profiles_by_id(doc).get(str(pid or "").strip())
+
+
 # ------------------------------------------------------------
 # Public API: load / save
 # ------------------------------------------------------------
 def load_profiles(path: str = DEFAULT_PROFILE_FILE) -> Dict[str, Any]:
     """
-    Load profiles document from JSON file.
+    Load profiles document from disk (JSON or msgpack, sniffed per file).
+
+    回傳的是「記憶體表示」：profiles 放在 doc["profiles_by_id"]（id -> profile）；
+    要給外部（API / 檔案）請用 export_doc。
 
     保底策略：
     - 檔案不存在：建立一份 default doc 並落盤
     - JSON 壞掉或讀取失敗：重建檔案（避免整個服務掛掉）
     - 結構不是 dict / profiles 不是 list：強制修正成可用格式
+
+    快取：
+    - 以 (st_mtime_ns, st_size) 判斷檔案是否變動，沒變就回傳快取
+    - 回傳的 doc 跟快取 / pending snapshot 共用（不 deepcopy）：只能讀；要修改請先 copy_doc
     """
+    pending = _PENDING.get(path)
+    if pending is not None:
+        # 還沒 flush 的 debounced save 才是最新內容
+        return pending[1]
+
     if not os.path.exists(path):
+        _CACHE.pop(path, None)
         doc = _default_doc()
-        _atomic_write_json(path, doc)
+        _atomic_write_bytes(path, _encode_doc(export_doc(doc)))
+        _cache_store(path, doc)
         return doc
 
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            doc = json.load(f)
+        st = os.stat(path)
+        cached = _CACHE.get(path)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+
+        with open(path, "rb") as f:
+            doc = _loads_doc(f.read())
+    except MsgpackUnavailableError:
+        # 檔案沒壞，只是缺套件：不能當成壞檔重建，否則資料會被覆蓋
+        raise
     except Exception:
         # 檔案壞掉：保底重建，避免整個服務掛掉
+        _CACHE.pop(path, None)
         doc = _default_doc()
-        _atomic_write_json(path, doc)
+        _atomic_write_bytes(path, _encode_doc(export_doc(doc)))
+        _cache_store(path, doc)
         return doc
 
-    # 結構防呆：確保最終回傳一定是 dict
-    if not isinstance(doc, dict):
-        doc = _default_doc()
+    if (
+        type(doc) is dict
+        and doc.get("schema") == SCHEMA_VERSION
+        and "current_profile_id" in doc
+        and type(doc.get("profiles")) is list
+    ):
+        # 快速路徑：本程式自己寫出的檔案（schema 相符、結構完整）不必逐項補齊
+        profiles = doc.pop("profiles")
+    else:
+        # 結構防呆：確保最終回傳一定是 dict
+        if not isinstance(doc, dict):
+            doc = {}
+
+        # 補齊必要欄位
+        doc.setdefault("schema", SCHEMA_VERSION)
+        doc.setdefault("current_profile_id", "")
+        profiles = doc.pop("profiles", None)
+
+        # profiles 型別防呆
+        if not isinstance(profiles, list):
+            profiles = []
+
+    by_id = _index_profiles(profiles)
+    doc["profiles_by_id"] = by_id
+
+    if _needs_migration(profiles, by_id):
+        # 舊檔遷移：補好的 updated_at / 去重結果立刻寫回，只蓋一次時間戳
+        try:
+            _write_profiles(path, export_doc(doc), doc, False)
+            return doc
+        except Exception:
+            logging.exception(f"profiles migration write failed: {path}")
+
+    _CACHE[path] = (st.st_mtime_ns, st.st_size, doc)
+    return doc
 
-    # 補齊必要欄位
-    doc.setdefault("schema", SCHEMA_VERSION)
-    doc.setdefault("current_profile_id", "")
-    doc.setdefault("profiles", [])
 
-    # profiles 型別防呆
-    if not isinstance(doc["profiles"], list):
-        doc["profiles"] = []
+def _write_profiles(
+    path: str,
+    out: Dict[str, Any],
+    mem: Dict[str, Any],
+    durable: bool,
+) -> None:
+    """Write an exported doc to disk (PROFILE_FORMAT) and refresh the in-memory cache."""
+    with _WRITE_LOCK:
+        try:
+            _atomic_write_bytes(path, _encode_doc(out), durable=durable)
+        except Exception:
+            _CACHE.pop(path, None)
+            raise
+        # 寫完直接更新快取，下一次 load 只需要 stat()
+        _cache_store(path, mem)
+
+
+def _flush_path(path: str) -> None:
+    """Write the pending snapshot for `path` (if any) right now."""
+    with _WRITE_LOCK:
+        pending = _PENDING.pop(path, None)
+        if pending is not None:
+            out, mem = pending
+            _write_profiles(path, out, mem, durable=False)
+
+
+def _is_pending(path: str, mem: Dict[str, Any]) -> bool:
+    """
+    Whether `mem` is still the latest pending snapshot for `path`.
 
-    return doc
+    比對 mem（dict）的 identity，不比 tuple：mypyc 會把 Tuple[...] 拆成 native struct，tuple 不保留 identity
+    """
+    cur = _PENDING.get(path)
+    return cur is not None and cur[1] is mem
+
+
+def _write_pending(path: str, out: Dict[str, Any], mem: Dict[str, Any]) -> None:
+    """Thread worker：mem 還是最新那份才寫（已被 flush_profiles_sync 寫掉或被新 save 取代就跳過）。"""
+    with _WRITE_LOCK:
+        if _is_pending(path, mem):
+            _write_profiles(path, out, mem, False)
+
+
+async def _flush_later() -> None:
+    """
+    Debounce task：等 SAVE_DEBOUNCE_SEC 後把所有 pending doc 一次寫出。
+
+    - 寫檔丟到 worker thread，不卡 event loop
+    - 寫完才把 pending 拿掉：寫的途中 load_profiles 仍然讀到 pending（最新內容），不會讀到舊檔
+    - 寫的途中又有新的 save：pending 換成新的那份，這個 task 迴圈再寫一次
+    - 寫檔失敗：不丟掉（API 已經回 ok，丟了重開機就會遺失），留在 pending 退避重試；
+      期間 load_profiles 照樣讀 pending，shutdown 的 durable 寫入也會再試一次
+    """
+    global _FLUSH_TASK
+    try:
+        await asyncio.sleep(SAVE_DEBOUNCE_SEC)
+        delay = SAVE_DEBOUNCE_SEC
+        while _PENDING:
+            failed = False
+            for path in list(_PENDING):
+                item = _PENDING.get(path)
+                if item is None:
+                    # 等別的 path 寫檔時被 durable 寫入取代掉了
+                    continue
+                out, mem = item
+                try:
+                    await asyncio.to_thread(_write_pending, path, out, mem)
+                except Exception:
+                    logging.exception(f"profiles flush failed (will retry in {delay:.2f}s): {path}")
+                    failed = True
+                    continue
+                if _is_pending(path, mem):
+                    del _PENDING[path]
+            if failed:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, SAVE_RETRY_MAX_SEC)
+    finally:
+        # 被 flush_profiles_sync cancel 後可能已經有新的 task 接手，只清掉自己
+        if _FLUSH_TASK is asyncio.current_task():
+            _FLUSH_TASK = None
+
+
+def flush_profiles_sync() -> None:
+    """
+    Write every pending (debounced) save immediately.
+
+    給 shutdown 用：確保最後一次修改不會因為 debounce 還沒到就遺失。
+    """
+    global _FLUSH_TASK
+    if _FLUSH_TASK is not None:
+        _FLUSH_TASK.cancel()
+        _FLUSH_TASK = None
+    for path in list(_PENDING):
+        _flush_path(path)
 
 
-def save_profiles(doc: Dict[str, Any], path: str = DEFAULT_PROFILE_FILE) -> None:
+def save_profiles(
+    doc: Dict[str, Any],
+    path: str = DEFAULT_PROFILE_FILE,
+    *,
+    durable: bool = False,
+) -> None:
     """
-    Save profiles document to JSON file.
+    Save profiles document to disk (JSON, or msgpack with PROFILE_FORMAT=msgpack).
 
     注意：
     - 這裡刻意固定 key 順序與內容，避免外部亂塞其它 key 造成檔案膨脹
+    - profiles_by_id 以 list 寫出，維持原本 JSON schema
     - schema 永遠以本程式定義版本為準
+    - 預設不 fsync（快速路徑）；需要保證落盤請用 save_profiles_durable
+
+    Debounce：
+    - 在 event loop 裡呼叫（非 durable）時，只記下 snapshot，
+      SAVE_DEBOUNCE_SEC 內連續多次修改合併成一次寫檔
+    - load_profiles 會先看 pending snapshot，所以讀到的一定是最新內容
+    - 沒有 running loop（CLI / 同步呼叫）時照舊立即寫檔
     """
-    out = {
-        "schema": SCHEMA_VERSION,
-        "current_profile_id": str(doc.get("current_profile_id", "") or ""),
-        "profiles": doc.get("profiles", []) or [],
+    global _FLUSH_TASK
+    out = export_doc(doc)
+    mem = {
+        "schema": out["schema"],
+        "current_profile_id": out["current_profile_id"],
+        "profiles_by_id": copy.deepcopy(_profiles_by_id(doc)),
     }
-    _atomic_write_json(path, out)
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    if durable or loop is None:
+        _PENDING.pop(path, None)
+        _write_profiles(path, out, mem, durable=durable)
+        return
+
+    _PENDING[path] = (out, mem)
+    if _FLUSH_TASK is None:
+        _FLUSH_TASK = loop.create_task(_flush_later())
+
+
+def save_profiles_durable(doc: Dict[str, Any], path: str = DEFAULT_PROFILE_FILE) -> None:
+    """Save profiles document and fsync it (file + parent dir) before returning."""
+    save_profiles(doc, path, durable=True)
 
 
 # ------------------------------------------------------------
-# Profile normalization
+# Profile model / normalization
 # ------------------------------------------------------------
-def normalize_profile(p: Dict[str, Any]) -> Dict[str, Any]:
+@dataclass(slots=True)
+class Profile:
+    """
+    Normalized profile（固定 schema，用 slots 取代 7-key dict）.
+
+    只有寫檔 / API 回應時才經由 export_doc 轉回 dict。
+    """
+    id: str
+    name: str
+    mode: str
+    ssid: str
+    password: str
+    mqtt: str
+    updated_at: int
+
+
+def normalize_profile(p: Dict[str, Any], now_ms: Optional[int] = None) -> Profile:
     """
     Normalize a profile dict into the canonical shape.
 
@@ -129,30 +549,39 @@ def normalize_profile(p: Dict[str, Any]) -> Dict[str, Any]:
     mode 僅允許：
     - LOCAL
     - AWS
+
+    now_ms：缺 updated_at 時使用的時間；呼叫端已取過時間就傳進來，少一次取時
     """
-    pid = str(p.get("id", "") or "").strip()
-    name = str(p.get("name", "") or "").strip()
+    pid = _s(p.get("id"))
+    name = _s(p.get("name"))
 
-    mode = str(p.get("mode", "LOCAL") or "LOCAL").strip().upper()
-    if mode not in ("LOCAL", "AWS"):
-        mode = "LOCAL"
+    raw_mode = p.get("mode")
+    if isinstance(raw_mode, str):
+        mode = _MODES.get(raw_mode) or _MODES.get(raw_mode.strip().upper(), MODE_LOCAL)
+    else:
+        mode = MODE_LOCAL
 
-    ssid = str(p.get("ssid", "") or "").strip()
-    password = str(p.get("password", "") or "").strip()
-    mqtt = str(p.get("mqtt", "") or "").strip()
+    ssid = _s(p.get("ssid"))
+    password = _s(p.get("password"))
+    mqtt = _s(p.get("mqtt"))
 
-    # 若傳入沒有 updated_at，採用現在時間；若有則盡量轉成 int
-    updated_at = int(p.get("updated_at") or _now_ms())
+    # 若傳入沒有 updated_at（或格式不對），採用現在時間；若有則盡量轉成 int
+    if now_ms is None:
+        now_ms = _now_ms()
+    try:
+        updated_at = int(p.get("updated_at") or now_ms)
+    except (TypeError, ValueError):
+        updated_at = now_ms
 
-    return {
-        "id": pid,
-        "name": name,
-        "mode": mode,
-        "ssid": ssid,
-        "password": password,
-        "mqtt": mqtt,
-        "updated_at": updated_at,
-    }
+    return Profile(
+        id=pid,
+        name=name,
+        mode=mode,
+        ssid=ssid,
+        password=password,
+        mqtt=mqtt,
+        updated_at=updated_at,
+    )
 
 
 # ------------------------------------------------------------
@@ -171,24 +600,18 @@ def upsert_profile(
     - 若 overwrite_id 有給：以 overwrite_id 為準（用於「另存/覆蓋」的情境）
     - upsert 成功會把 current_profile_id 一起指向該 profile
     """
-    p = normalize_profile(profile)
-    pid = (overwrite_id or p["id"]).strip()
+    now_ms = _now_ms()
+    p = normalize_profile(profile, now_ms)
+    pid = (overwrite_id or p.id).strip()
 
     if not pid:
         return False, "Profile ID 不能為空"
 
-    profiles: List[Dict[str, Any]] = doc.get("profiles", [])
-    idx = next((i for i, x in enumerate(profiles) if str(x.get("id", "")) == pid), -1)
-
-    p["id"] = pid
-    p["updated_at"] = _now_ms()
-
-    if idx >= 0:
-        profiles[idx] = p
-    else:
-        profiles.append(p)
+    p.id = pid
+    p.updated_at = now_ms
 
-    doc["profiles"] = profiles
+    # 既有 id：dict 指派會保留原本位置；新 id：接在最後
+    _profiles_by_id(doc)[pid] = p
     doc["current_profile_id"] = pid
     return True, pid
 
@@ -204,14 +627,12 @@ def delete_profile(doc: Dict[str, Any], pid: str) -> bool:
     if not pid:
         return False
 
-    before = len(doc.get("profiles", []))
-    doc["profiles"] = [p for p in doc.get("profiles", []) if str(p.get("id", "")) != pid]
-    after = len(doc.get("profiles", []))
+    removed = _profiles_by_id(doc).pop(pid, None) is not None
 
     if doc.get("current_profile_id") == pid:
         doc["current_profile_id"] = ""
 
-    return after != before
+    return removed
 
 
 def set_current_profile(doc: Dict[str, Any], pid: str) -> Tuple[bool, str]:
@@ -227,8 +648,7 @@ def set_current_profile(doc: Dict[str, Any], pid: str) -> Tuple[bool, str]:
         doc["current_profile_id"] = ""
         return True, ""
 
-    exists = any(str(p.get("id", "")) == pid for p in doc.get("profiles", []))
-    if not exists:
+    if pid not in _profiles_by_id(doc):
         return False, "Profile 不存在"
 
     doc["current_profile_id"] = pid
@@ -1,22 +1,42 @@
 import os
-import json
+import re
 import time
+import hashlib
+import importlib.util
 import asyncio
 import logging
-from typing import List, Dict, Any, Optional
-
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
+import weakref
+from functools import lru_cache
+from operator import itemgetter
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Optional, Tuple, TypedDict
+
+import orjson
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from bleak import BleakScanner, BleakClient
+from bleak.exc import BleakError
+
+try:
+    from bleak_retry_connector import establish_connection
+except ImportError:  # 選用：沒裝就直接 client.connect()（重試仍由 _establish 做）
+    establish_connection = None
 
 from profile_store import (
     load_profiles,
     save_profiles,
+    save_profiles_durable,
+    flush_profiles_sync,
+    export_doc,
+    copy_doc,
+    get_profile,
     upsert_profile,
     delete_profile,
     set_current_profile,
+    _atomic_write_bytes,
 )
 from gatt_profiles import get_profile_by_adv_name
 
@@ -47,6 +67,9 @@ SCAN_TIMEOUT_SEC = 8.0
 
 # Profiles
 PROFILE_FILE = "/data/profiles.json"
+# 只有 writer（upsert/select/delete/flush）拿鎖，把 load -> 改 -> commit 串起來
+# reader（GET / write_profile 查詢）不拿鎖：直接讀 CURRENT_DOC，中間沒有 await，
+# 在單一 event loop 上不可能跟 writer 交錯，所以 RW lock 的「多 reader 並行」其實沒有東西可並行
 PROFILE_LOCK = asyncio.Lock()
 
 
@@ -54,16 +77,31 @@ PROFILE_LOCK = asyncio.Lock()
 # 全域鎖定器 (定義在 app 外部)
 # ------------------------------------------------------------
 # 限制總體併發，建議 3-5，這影響的是「已連線」後的傳輸
-MAX_CONCURRENT_BLE = asyncio.Semaphore(5)
-# 核心：強制「連線動作」必須一個一個來
-BLE_CONNECT_LOCK = asyncio.Lock()
+# 可用環境變數 BLE_MAX_CONCURRENT 調（依 adapter 能撐的連線數）
+BLE_CONCURRENCY = max(1, int(os.getenv("BLE_MAX_CONCURRENT", "5")))
+MAX_CONCURRENT_BLE = asyncio.Semaphore(BLE_CONCURRENCY)
+# 每個 request 最多幾個 worker 同時處理 targets（一般 BT controller 也就 4 條左右的連線 slot）
+# 可用環境變數 BLE_WORKERS 調；超過 BLE_CONCURRENCY 沒有意義
+BLE_WORKERS = max(1, min(int(os.getenv("BLE_WORKERS", "4")), BLE_CONCURRENCY))
+# 核心：限制同時進行中的「連線動作」（BlueZ mgmt 操作是串行的，同時 connect 太多會 InProgress / abort）
+# 預設 1 = 一個一個來；adapter 撐得住可用環境變數 BLE_MAX_CONNECTING 調高（例如 3），不超過 BLE_CONCURRENCY
+BLE_CONNECTING = max(1, min(int(os.getenv("BLE_MAX_CONNECTING", "1")), BLE_CONCURRENCY))
+BLE_CONNECT_SEM = asyncio.Semaphore(BLE_CONNECTING)
+# connect 遇到 BleakError（le-connection-abort-by-local、InProgress 等暫時性錯誤）重試幾次；
+# 間隔 100ms、200ms、400ms...（指數退避，等待時不佔 BLE_CONNECT_SEM）
+BLE_CONNECT_RETRIES = max(0, int(os.getenv("BLE_CONNECT_RETRIES", "3")))
+BLE_CONNECT_BACKOFF_SEC = 0.1
 
 
 
 # ------------------------------------------------------------
 # FastAPI App
 # ------------------------------------------------------------
-app = FastAPI(title="BLE Lab (MVP-2: Probe + Fetch Details)")
+# 所有 JSON route 都用 orjson 編碼（比預設 JSONResponse 快，scan 結果大時差最多）
+app = FastAPI(
+    title="BLE Lab (MVP-2: Probe + Fetch Details)",
+    default_response_class=ORJSONResponse,
+)
 
 # 靜態網頁（目前主要用 / 讀 index.html；/static 暫時可留）
 app.mount("/static", StaticFiles(directory="/web"), name="static")
@@ -77,25 +115,171 @@ def ensure_data_dir() -> None:
     os.makedirs(DATA_DIR, exist_ok=True)
 
 
+# path -> (st_mtime_ns, st_size, 解析後的物件)
+_json_cache: Dict[str, Any] = {}
+
+
 def load_json(path: str, default: Any) -> Any:
-    """Load JSON; return `default` on any error."""
+    """
+    Load JSON (orjson, bytes in); return `default` on any error.
+
+    - 以 (st_mtime_ns, st_size) 判斷檔案是否變動；沒變就回傳上次解析的物件（不重讀不重 parse）
+    - 回傳的物件是共用的：呼叫端只能讀，不要就地修改
+    """
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        st = os.stat(path)
+        hit = _json_cache.get(path)
+        if hit is not None and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            return hit[2]
+        with open(path, "rb") as f:
+            obj = orjson.loads(f.read())
     except Exception:
+        _json_cache.pop(path, None)
         return default
+    _json_cache[path] = (st.st_mtime_ns, st.st_size, obj)
+    return obj
+
 
+# path -> 上次寫出內容的 blake2b（內容沒變就不重寫）
+_last_hash: Dict[str, bytes] = {}
+
+
+def save_json(path: str, obj: Any, pretty: bool = True, durable: bool = True) -> None:
+    """
+    Save JSON (orjson, one write).
+
+    - pretty=False：不縮排（scan cache 這種機器讀的檔案，縮排只是多花時間與空間）
+    - 落盤走 profile_store._atomic_write_bytes（path.tmp + os.replace；durable=True 時 fsync 檔案與目錄）
+      scan cache 可重建，呼叫端傳 durable=False 跳過 fsync，不被磁碟 barrier 卡住
+    - 內容和上次寫出的一樣就跳過（例如 cache 過期時反覆寫空 payload）
+    """
+    opt = orjson.OPT_NON_STR_KEYS
+    if pretty:
+        opt |= orjson.OPT_INDENT_2
+    data = orjson.dumps(obj, option=opt)
+    h = hashlib.blake2b(data, digest_size=16).digest()
+    if _last_hash.get(path) == h:
+        return
 
-def save_json(path: str, obj: Any) -> None:
-    """Save JSON with pretty indent."""
     ensure_data_dir()
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
+    _atomic_write_bytes(path, data, durable=durable)
+    _last_hash[path] = h
+
+
+# 背景 thread 寫檔時同一時間只一個（同 path 共用 path.tmp）
+_JSON_WRITE_LOCK = asyncio.Lock()
+
+
+async def asave_json(path: str, obj: Any, pretty: bool = True, durable: bool = True) -> None:
+    """save_json in a worker thread (dumps/write/fsync 不卡 event loop)."""
+    async with _JSON_WRITE_LOCK:
+        await asyncio.to_thread(save_json, path, obj, pretty, durable)
+
+
+# 背景 task（disconnect、scan cache 落盤）的強參照（沒人持有的 task 可能被 GC 掉）
+_BG_TASKS: set = set()
+
+
+def _spawn_bg(coro) -> None:
+    """Run `coro` as a fire-and-forget task (kept alive in _BG_TASKS until done)."""
+    task = asyncio.create_task(coro)
+    _BG_TASKS.add(task)
+    task.add_done_callback(_BG_TASKS.discard)
+
+
+# ============================================================
+# Utils: HTTP ETag / If-None-Match
+# ============================================================
+# process 啟動時產生一次：版本計數器重開機會歸零，加上它 ETag 才不會跟重開前的撞在一起
+_BOOT_ID = os.urandom(4).hex()
+
+
+def _etag_of(body: bytes) -> str:
+    """Strong ETag from the response body (128-bit blake2b)."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """
+    Whether the request's If-None-Match matches `etag`（weak comparison，RFC 9110）.
+
+    - 可能是逗號分隔的多個 tag，或 "*"
+    - W/ 前綴不計：GET 的 If-None-Match 本來就用 weak comparison
+    """
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    if inm.strip() == "*":
+        return True
+    want = etag[2:] if etag.startswith("W/") else etag
+    for tag in inm.split(","):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith("W/") else tag) == want:
+            return True
+    return False
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
 
 
 # ============================================================
 # Utils: BLE scan cache helpers
 # ============================================================
+# scan_cache.json 的記憶體副本：(st_mtime_ns, st_size) 沒變就不重讀
+# scan_cache.json 的 address 索引；payload 換了（load_json 回傳新物件）才重建
+# scan cache 以記憶體為準（只有本 process 會寫）；磁碟檔只在啟動後第一次讀時用來復原
+# gen：每次換 payload 就 +1，給 /api/devices 的 ETag 用（不必 hash 整份結果）
+_SCAN_CACHE: Dict[str, Any] = {"payload": None, "by_addr": {}, "zp2": [], "gen": 0}
+_EMPTY_SCAN: Dict[str, Any] = {"ts": 0, "results": []}
+
+
+def _set_scan_cache(payload: Dict[str, Any]) -> None:
+    """
+    Replace the in-memory scan cache and rebuild its indexes.
+
+    - by_addr：address -> scan row，讓 MAC 查詢變 O(1)
+    - zp2：只含 is_zp2 的 rows（/api/devices 預設 only_zp2，輪詢時不用每次重 filter）
+    - gen：內容版本號（ETag）
+    """
+    results = payload.get("results") or []
+    _SCAN_CACHE.update({
+        "payload": payload,
+        "by_addr": {str(r.get("address")): r for r in results if isinstance(r, dict)},
+        "zp2": [r for r in results if isinstance(r, dict) and r.get("is_zp2")],
+        "gen": _SCAN_CACHE["gen"] + 1,
+    })
+
+
+def _get_scan_cache() -> Dict[str, Any]:
+    """
+    Return {"payload": ..., "by_addr": ..., "zp2": ...}.
+
+    - 平常直接回記憶體（/api/scan 當下就更新，磁碟是 write-behind）
+    - 啟動後第一次：從 CACHE_PATH 復原；檔案不存在/壞掉就是空 payload
+    """
+    if _SCAN_CACHE["payload"] is None:
+        payload = load_json(CACHE_PATH, default=None)
+        _set_scan_cache(payload if isinstance(payload, dict) else _EMPTY_SCAN)
+    return _SCAN_CACHE
+
+
+@app.on_event("startup")
+async def _preload_scan_cache():
+    """
+    Restore the scan cache from disk once at startup, off the event loop.
+
+    之後 payload 一定不是 None（讀不到就是空 payload），所以 find_adv_name_in_cache /
+    resolve_target_profiles 在 async route 裡呼叫 _get_scan_cache 時不會再同步讀檔
+    """
+    await asyncio.to_thread(_get_scan_cache)
+
+
+def _write_scan_cache_behind(payload: Dict[str, Any]) -> None:
+    """Persist the scan cache in the background（不等磁碟；asave_json 的 lock 保證依序寫）."""
+    _spawn_bg(asave_json(CACHE_PATH, payload, pretty=False, durable=False))
+
+
 def find_adv_name_in_cache(address: str) -> str:
     """
     Find ADV name from scan cache by device address.
@@ -104,73 +288,72 @@ def find_adv_name_in_cache(address: str) -> str:
     - 型號判斷只用 ADV name（你已拍板）
     - cache miss 時回傳空字串
     """
-    cache = load_json(CACHE_PATH, default={"ts": 0, "results": []})
-    for d in (cache.get("results") or []):
-        if str(d.get("address")) == str(address):
-            return str(d.get("name") or "")
-    return ""
+    row = _get_scan_cache()["by_addr"].get(str(address))
+    return str(row.get("name") or "") if row else ""
 
 
-# ============================================================
-# Utils: Bleak device properties
-# ============================================================
-def get_props(device) -> Dict[str, Any]:
+def find_adv_names_in_cache(addresses: List[str]) -> Dict[str, str]:
     """
-    Read bleak device.details.props if present.
+    Batch version of find_adv_name_in_cache: address -> ADV name ("" on miss).
 
-    bleak 的 details/props 取決於平台與版本；這裡用安全方式取。
+    每個 endpoint 在 fan-out 前呼叫一次，scan cache 只取一次。
     """
-    details = getattr(device, "details", None)
-    if isinstance(details, dict):
-        return details.get("props", {}) or {}
-    return {}
+    by_addr = _get_scan_cache()["by_addr"]
+    out: Dict[str, str] = {}
+    for a in addresses:
+        row = by_addr.get(str(a))
+        out[a] = str(row.get("name") or "") if row else ""
+    return out
 
 
-def get_name(device, props: Dict[str, Any]) -> Optional[str]:
+def resolve_target_profiles(addresses: List[str]) -> Dict[str, Tuple[str, Any]]:
     """
-    Prefer bleak device.name; fallback to props Name/Alias.
+    address -> (adv_name, profile or None), resolved once before the BLE fan-out.
+
+    - 純查表（scan cache + gatt_profiles 的 lru_cache），與 BLE I/O 無關，所以在派工前一次做完
+    - profile 為 None：該台不支援，per-target helper 一開始就直接回錯誤（不連線）
     """
-    name = getattr(device, "name", None)
-    if name:
-        return name
-    return props.get("Name") or props.get("Alias")
+    names = find_adv_names_in_cache(addresses)
+    return {a: (n, get_profile_by_adv_name(n)) for a, n in names.items()}
 
 
-def get_rssi(props: Dict[str, Any]) -> Optional[int]:
-    """RSSI may exist in props depending on platform/backend."""
-    return props.get("RSSI")
+# ============================================================
+# Utils: Bleak device properties
+# ============================================================
+_BYTES_LIKE = (bytes, bytearray, memoryview)
 
 
-def is_zp2_candidate(name: Optional[str], props: Dict[str, Any]) -> bool:
+def _mfg(md: Dict[Any, Any]) -> Dict[str, str]:
+    """
+    ManufacturerData -> JSON-friendly dict（company id 轉 str，bytes 轉 hex）.
+
+    orjson 不會直接序列化 bytes，所以 hex 仍在這裡做（bytes.hex() 本身是 C 實作）。
+    """
+    return {str(k): (v.hex() if isinstance(v, _BYTES_LIKE) else str(v)) for k, v in md.items()}
+
+
+# Alias 不分大小寫比對：regex 在 C 裡 case-fold，不產生 upper() 的暫存字串
+_ZP2_RE = re.compile("ZP2", re.IGNORECASE)
+
+
+def is_zp2_candidate(name_u: str, props: Dict[str, Any]) -> bool:
     """
     Legacy heuristic: detect ZP2 by substring.
 
     你目前保留此欄位（同時也有 model_key / is_supported）。
+    - name_u：呼叫端已 strip().upper() 過的 ADV name（和 profile 查詢共用，不重算）
+    - Alias：用 _ZP2_RE 直接搜，不另外 upper()
     """
-    if name and "ZP2" in name.upper():
+    if "ZP2" in name_u:
         return True
 
     alias = props.get("Alias")
-    if isinstance(alias, str) and "ZP2" in alias.upper():
-        return True
-
-    return False
+    return isinstance(alias, str) and _ZP2_RE.search(alias) is not None
 
 
 # ============================================================
 # Utils: text/bytes encode & decode
 # ============================================================
-def _bytes_to_text(b: bytes) -> str:
-    """Decode bytes to a clean UTF-8 string; strip NUL."""
-    if not b:
-        return ""
-
-    try:
-        return b.decode("utf-8", errors="replace").replace("\x00", "").strip()
-    except Exception:
-        return ""
-
-
 def _encode_text(s: str) -> bytes:
     """Encode string as UTF-8 bytes (no NUL termination here)."""
     return (s or "").encode("utf-8")
@@ -179,59 +362,244 @@ def _encode_text(s: str) -> bytes:
 # ============================================================
 # BLE Scan
 # ============================================================
-async def do_scan() -> List[Dict[str, Any]]:
+class ScanRow(TypedDict):
+    """One scan result row（/api/scan、/api/devices、scan_cache.json 共用的形狀）."""
+    address: str
+    name: Optional[str]
+    rssi: Optional[int]
+    address_type: Optional[str]
+    manufacturer_data: Dict[str, str]
+    is_zp2: bool        # legacy heuristic
+    model_key: str      # e.g. "ZP2" / future "ZS2"
+    is_supported: bool  # whether profile exists
+
+
+# 常駐 scanner：startup 時啟動，detection_callback 持續更新 LIVE_ADVS
+# address -> (device, adv, time.monotonic())
+LIVE_ADVS: Dict[str, Any] = {}
+SCANNER: Optional[BleakScanner] = None
+SCANNER_STARTED_AT = 0.0
+# 有「支援的裝置」出現時 set（給 quick scan 提早結束用）
+_LIVE_SUPPORTED = asyncio.Event()
+
+
+def _on_live_adv(device, adv) -> None:
+    """Detection callback of the long-lived scanner."""
+    LIVE_ADVS[device.address] = (device, adv, time.monotonic())
+    if get_profile_by_adv_name(device.name or adv.local_name):
+        _LIVE_SUPPORTED.set()
+
+
+@app.on_event("startup")
+async def _start_live_scanner():
+    """
+    Start one BleakScanner for the whole app lifetime.
+
+    - /api/scan 只對 LIVE_ADVS 拍快照，不再每次走 DBus start/stop
+    - 啟動失敗（例如 adapter 還沒好）就維持 SCANNER=None，do_scan 退回單次掃描
+    """
+    global SCANNER, SCANNER_STARTED_AT
+    scanner = BleakScanner(detection_callback=_on_live_adv)
+    try:
+        await scanner.start()
+    except Exception as e:
+        logging.error(f"live scanner start failed; falling back to one-shot scans: {e}")
+        return
+    SCANNER = scanner
+    SCANNER_STARTED_AT = time.monotonic()
+    logging.info("live scanner started")
+
+
+@app.on_event("shutdown")
+async def _stop_live_scanner():
+    """Stop the long-lived scanner."""
+    global SCANNER
+    scanner, SCANNER = SCANNER, None
+    if scanner is not None:
+        try:
+            await scanner.stop()
+        except Exception:
+            pass
+
+
+async def _scan_once(stop_on_supported: bool) -> List[Any]:
+    """
+    One-shot scan (fallback when the live scanner is not running).
+
+    - 用 detection_callback 串流收 ADV（同一台以 address 去重，保留最新一筆）
+    """
+    seen: Dict[str, Any] = {}
+    found = asyncio.Event()
+
+    def on_adv(device, adv) -> None:
+        seen[device.address] = (device, adv)
+        if stop_on_supported and get_profile_by_adv_name(device.name or adv.local_name):
+            found.set()
+
+    async with BleakScanner(detection_callback=on_adv):
+        try:
+            await asyncio.wait_for(found.wait(), timeout=SCAN_TIMEOUT_SEC)
+        except asyncio.TimeoutError:
+            pass
+
+    return list(seen.values())
+
+
+def _live_snapshot(since: float = 0.0) -> List[Any]:
+    """
+    Snapshot LIVE_ADVS: entries seen within SCAN_TIMEOUT_SEC (and not before `since`).
+
+    - 超過 SCAN_CACHE_TTL_SEC 沒再出現的順手清掉（random MAC 不會無限長大）
+    - since：time.monotonic() 時間點；force_refresh 用，只要這之後才收到的 ADV
+    """
+    now = time.monotonic()
+    out = []
+    for addr, (d, adv, ts) in list(LIVE_ADVS.items()):
+        age = now - ts
+        if age <= SCAN_TIMEOUT_SEC and ts >= since:
+            out.append((d, adv))
+        elif age > SCAN_CACHE_TTL_SEC:
+            del LIVE_ADVS[addr]
+    return out
+
+
+def _has_supported(pairs: List[Any]) -> bool:
+    return any(get_profile_by_adv_name(d.name or adv.local_name) for d, adv in pairs)
+
+
+async def _fresh_live_snapshot(stop_on_supported: bool) -> List[Any]:
+    """
+    force_refresh：不用舊快照，只收這次呼叫之後 scanner 看到的 ADV.
+
+    - 不另開 BleakScanner（BlueZ 上和常駐 scanner 搶 discovery 反而不穩），等常駐 scanner 收一輪
+    - stop_on_supported=True：等到第一台支援的裝置出現就回
+    """
+    since = time.monotonic()
+    if stop_on_supported:
+        _LIVE_SUPPORTED.clear()
+        try:
+            await asyncio.wait_for(_LIVE_SUPPORTED.wait(), timeout=SCAN_TIMEOUT_SEC)
+        except asyncio.TimeoutError:
+            pass
+    else:
+        await asyncio.sleep(SCAN_TIMEOUT_SEC)
+    return _live_snapshot(since)
+
+
+async def do_scan(
+    stop_on_supported: bool = False,
+    force_refresh: bool = False,
+    include_manufacturer_data: bool = False,
+) -> List[ScanRow]:
     """
     Scan BLE devices and produce cache-friendly list.
 
+    - 常駐 scanner 在跑：直接對 LIVE_ADVS 拍快照（最近 SCAN_TIMEOUT_SEC 內看到的）
+      - 剛啟動還不滿一個 SCAN_TIMEOUT_SEC：補等到滿，快照才完整
+      - stop_on_supported=True：快照裡已有支援的裝置就立刻回；沒有就等到第一台出現
+    - force_refresh=True：丟掉舊快照，重新收一輪（給不常廣播、剛剛沒被看到的裝置）
+    - 沒有常駐 scanner：退回單次掃描（_scan_once），本來就是新的一輪
     - model 判斷：用 adv_name 丟給 get_profile_by_adv_name
+    - manufacturer_data：預設只給 ZP2 / 支援的裝置（其他裝置給 {}，省 hex 轉換）；
+      include_manufacturer_data=True 才每台都給
     - 排序：ZP2 優先，其次 RSSI 強者優先
     """
-    devices = await BleakScanner.discover(timeout=SCAN_TIMEOUT_SEC)
-
-    results: List[Dict[str, Any]] = []
-    for d in devices:
-        props = get_props(d)
+    if SCANNER is None:
+        pairs = await _scan_once(stop_on_supported)
+    elif force_refresh:
+        pairs = await _fresh_live_snapshot(stop_on_supported)
+    else:
+        pairs = _live_snapshot()
+        if stop_on_supported:
+            if not _has_supported(pairs):
+                _LIVE_SUPPORTED.clear()
+                try:
+                    await asyncio.wait_for(_LIVE_SUPPORTED.wait(), timeout=SCAN_TIMEOUT_SEC)
+                except asyncio.TimeoutError:
+                    pass
+                pairs = _live_snapshot()
+        else:
+            remaining = SCANNER_STARTED_AT + SCAN_TIMEOUT_SEC - time.monotonic()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+                pairs = _live_snapshot()
+
+    # (sortkey, row)：key 在迴圈內順手算好，排序用 C 實作的 itemgetter，不進 Python callback
+    # sortkey：ZP2 優先，其次 RSSI 強者優先（沒有 RSSI 當 -999）
+    keyed: List[Any] = []
+    for d, adv in pairs:
+        # 欄位讀取直接 inline（每台省三次 helper 呼叫）：
+        # - props：bleak 的 details/props 取決於平台與版本，安全地取
+        # - name：bleak device.name 優先，再來 props Name/Alias，最後 ADV local_name
+        # - rssi：props 有就用（BlueZ），否則用 AdvertisementData.rssi
+        details = getattr(d, "details", None)
+        props = (details.get("props") or {}) if isinstance(details, dict) else {}
         address = getattr(d, "address", None)
-        name = get_name(d, props)
-        rssi = get_rssi(props)
-
-        profile = get_profile_by_adv_name(name)
+        name = getattr(d, "name", None) or props.get("Name") or props.get("Alias") or adv.local_name
+        rssi = props.get("RSSI")
+        if rssi is None:
+            rssi = getattr(adv, "rssi", None)
+
+        # upper 一次，is_zp2_candidate 與 profile 查詢（lru_cache key）共用
+        name_u = (name or "").strip().upper()
+        profile = get_profile_by_adv_name(name_u)
         model_key = profile.key if profile else ""
 
-        item = {
+        is_zp2 = is_zp2_candidate(name_u, props)
+
+        # ManufacturerData 多半是空的：空就直接給 {}，不建 comprehension
+        # 周圍一堆不相干的 BLE 裝置：沒要求 full 就不替它們做 hex
+        md_src = props.get("ManufacturerData")
+        if md_src and (include_manufacturer_data or is_zp2 or profile):
+            md = _mfg(md_src)
+        else:
+            md = {}
+
+        item: ScanRow = {
             "address": address,
             "name": name,
             "rssi": rssi,
             "address_type": props.get("AddressType"),
-            "manufacturer_data": {
-                str(k): (v.hex() if hasattr(v, "hex") else str(v))
-                for k, v in (props.get("ManufacturerData") or {}).items()
-            },
-            "is_zp2": is_zp2_candidate(name, props),  # legacy heuristic
+            "manufacturer_data": md,
+            "is_zp2": is_zp2,                         # legacy heuristic
             "model_key": model_key,                   # e.g. "ZP2" / future "ZS2"
             "is_supported": bool(profile),            # whether profile exists
         }
-        results.append(item)
+        keyed.append((
+            (0 if item["is_zp2"] else 1, -(rssi if isinstance(rssi, int) else -999)),
+            item,
+        ))
 
-    def rssi_sort(v: Dict[str, Any]) -> int:
-        r = v.get("rssi")
-        return r if isinstance(r, int) else -999
-
-    results.sort(key=lambda x: (not x["is_zp2"], -rssi_sort(x)))
-    return results
+    keyed.sort(key=itemgetter(0))
+    return [item for _, item in keyed]
 
 
 # ============================================================
 # GATT helpers for fetch_details / write
 # ============================================================
-async def _read_in_service(client: BleakClient, service_uuid: str, char_uuid: str) -> bytes:
+# client -> {(service_uuid, char_uuid): characteristic}
+# WeakKeyDictionary：client 被回收（每次連線都是新的 BleakClient）快取就跟著消失
+_CHAR_CACHE: "weakref.WeakKeyDictionary[BleakClient, Dict[Any, Any]]" = weakref.WeakKeyDictionary()
+
+
+def _resolve_char(client: BleakClient, service_uuid: str, char_uuid: str):
     """
-    Read by (service_uuid, char_uuid) using characteristic object.
+    Resolve (service_uuid, char_uuid) to a characteristic object, memoized per client.
 
     規則（你已拍板）：
     - 不直接用 UUID string 讀寫
     - 必須先透過 service 取得 characteristic 物件
+    - 同一條連線內解析過就直接用（fetch/write 同一顆 char 不再走兩次 UUID 查找）
     """
+    per_client = _CHAR_CACHE.get(client)
+    if per_client is None:
+        per_client = _CHAR_CACHE[client] = {}
+
+    key = (service_uuid, char_uuid)
+    ch = per_client.get(key)
+    if ch is not None:
+        return ch
+
     svcs = client.services
     if svcs is None:
         raise RuntimeError("client.services is None")
@@ -244,7 +612,28 @@ async def _read_in_service(client: BleakClient, service_uuid: str, char_uuid: st
     if ch is None:
         raise RuntimeError(f"char not found in {service_uuid}: {char_uuid}")
 
-    return await client.read_gatt_char(ch)
+    per_client[key] = ch
+    return ch
+
+
+def _forget_chars(client: Optional[BleakClient]) -> None:
+    """
+    Drop the characteristic cache of `client` (call when the connection ends).
+
+    WeakKeyDictionary 要等 client 被回收才會清；斷線就明確清掉，
+    同一個 client 物件若再 connect 也一定重新解析（handle 可能已變）。
+    """
+    if client is not None:
+        _CHAR_CACHE.pop(client, None)
+
+
+async def _read_in_service(client: BleakClient, service_uuid: str, char_uuid: str) -> bytes:
+    """
+    Read by (service_uuid, char_uuid) using characteristic object.
+
+    characteristic 物件由 _resolve_char 取得（per-client 快取）。
+    """
+    return await client.read_gatt_char(_resolve_char(client, service_uuid, char_uuid))
 
 
 async def _write_in_service(
@@ -260,30 +649,350 @@ async def _write_in_service(
     關鍵：
     - 用「特定 characteristic 物件」寫，而不是 UUID 字串
     - 避免 characteristic UUID 重複導致寫錯目標
+    - response=False 只有在兩個條件都成立時才生效，否則自動改回 True：
+      1) char 宣告 write-without-response
+      2) data 放得進一個 PDU（max_write_without_response_size = MTU - 3）；
+         放不下就要 long write，只有 write-with-response 做得到
     """
-    svcs = client.services
+    ch = _resolve_char(client, service_uuid, char_uuid)
+    if not response and not _fits_no_response(ch, data):
+        response = True
+    await client.write_gatt_char(ch, data, response=response)
+
+
+BLE_WRITE_ATTEMPTS = 3
+
+
+async def _write_with_retry(
+    client: BleakClient,
+    service_uuid: str,
+    char_uuid: str,
+    data: bytes,
+    response: bool = True,
+) -> None:
+    """
+    _write_in_service + 遇到暫時性 BleakError 時退避重試（100ms、200ms）.
+
+    - 取代以前每筆 write 之間固定 sleep：正常情況不等，只有 stack 回錯才等
+    - 寫的都是設定值（同一份 bytes 再寫一次結果相同），重試是安全的
+    - 連線斷了 is_connected 會是 False，重試沒有意義：直接往上丟，由連線池丟掉 session
+    """
+    for attempt in range(BLE_WRITE_ATTEMPTS):
+        try:
+            await _write_in_service(client, service_uuid, char_uuid, data, response=response)
+            return
+        except BleakError:
+            if attempt + 1 >= BLE_WRITE_ATTEMPTS or not client.is_connected:
+                raise
+            await asyncio.sleep(0.1 * (2 ** attempt))
+
+
+def _fits_no_response(ch, data: bytes) -> bool:
+    """Whether `data` can go out as a single write-without-response on `ch`."""
+    if "write-without-response" not in (getattr(ch, "properties", None) or ()):
+        return False
+    limit = getattr(ch, "max_write_without_response_size", None)
+    # 舊版 bleak 沒有這個屬性：用 BLE 預設 MTU 23 的 20 bytes 保守判斷
+    return len(data) <= (limit if isinstance(limit, int) and limit > 0 else 20)
+
+
+def _services_ready(client: BleakClient) -> bool:
+    """True when client.services is populated（部分 bleak 版本未 resolved 時會 raise）."""
+    try:
+        svcs = client.services
+    except Exception:
+        return False
     if svcs is None:
-        raise RuntimeError("client.services is None")
+        return False
+    inner = getattr(svcs, "services", None)
+    return bool(inner) if inner is not None else True
 
-    svc = svcs.get_service(service_uuid)
-    if svc is None:
-        raise RuntimeError(f"service not found: {service_uuid}")
 
-    ch = svc.get_characteristic(char_uuid)
-    if ch is None:
-        raise RuntimeError(f"char not found in {service_uuid}: {char_uuid}")
+async def _wait_services_resolved(client: BleakClient, timeout: float = 5.0) -> None:
+    """
+    Wait until GATT services are resolved（取代 connect 後固定 sleep 的「保險」）.
+
+    - bleak connect() 本來就會等 BlueZ ServicesResolved，正常情況第一次檢查就通過，零等待
+    - 少數 stack 忙碌時比較慢：每 20ms 檢查一次，最多等 timeout 秒，逾時就 raise
+    """
+    if _services_ready(client):
+        return
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        await asyncio.sleep(0.02)
+        if _services_ready(client):
+            return
+    raise RuntimeError(f"GATT services not resolved within {timeout}s")
+
+
+async def _settle(profile, attr: str) -> None:
+    """
+    Optional per-profile settle delay（預設 0 = 不等）.
+
+    - connect() 回來時 GATT services 已 resolved；write(response=True) 也已等到 peer ACK
+      所以不再一律 sleep；某型號實測真的需要緩衝，就在 profile 設 CONNECT_SETTLE_SEC / WRITE_SETTLE_SEC
+    """
+    sec = float(getattr(profile, attr, 0.0) or 0.0)
+    if sec > 0:
+        await asyncio.sleep(sec)
 
-    await client.write_gatt_char(ch, data, response=response)
+
+async def _read_endpoints(client: BleakClient, address: str, eps) -> List[bytes]:
+    """
+    Read several endpoints concurrently; re-read any that failed one by one.
+
+    - 先用 gather 一起發（多數 stack 會在同一個連線間隔內排多個 ATT request）
+    - 有些 peripheral/stack 不吃並行 ATT：失敗的那幾個改成逐個 read，再失敗才往上丟
+    """
+    raw = await asyncio.gather(
+        *[_read_in_service(client, ep.service, ep.char) for ep in eps],
+        return_exceptions=True,
+    )
+    failed = [i for i, r in enumerate(raw) if isinstance(r, BaseException)]
+    if failed:
+        first = raw[failed[0]]
+        if isinstance(first, asyncio.CancelledError):
+            raise first
+        logging.warning(f"[{address}] Concurrent read failed ({first!r}); retrying {len(failed)} sequentially")
+        for i in failed:
+            raw[i] = await _read_in_service(client, eps[i].service, eps[i].char)
+    return raw
+
+
+async def _connect_once(client: BleakClient, address: str) -> BleakClient:
+    """
+    One connect attempt (caller holds BLE_CONNECT_SEM); return the connected client.
+
+    - 有裝 bleak-retry-connector 且常駐 scanner 看過這台：用 establish_connection
+      （傳 BLEDevice 比傳 MAC 字串快；use_services_cache 讓重連時不必重新 discover GATT）
+      max_attempts=1：重試/退避由 _establish 做，它內部的等待才不會佔住 BLE_CONNECT_SEM
+    - 否則：沿用原本的 client.connect()
+    """
+    seen = LIVE_ADVS.get(address)
+    if establish_connection is not None and seen is not None:
+        logging.info(f"[{address}] Connecting (retry-connector)...")
+        client = await establish_connection(
+            BleakClient,
+            seen[0],
+            address,
+            max_attempts=1,
+            use_services_cache=True,
+        )
+    else:
+        logging.info(f"[{address}] Connecting...")
+        await client.connect()
+    await _wait_services_resolved(client)
+    return client
+
+
+async def _establish(client: BleakClient, address: str) -> BleakClient:
+    """
+    Connect `address`, retrying transient BleakError with exponential backoff; return the client.
+
+    - BLE_CONNECT_SEM 只在「單次」connect 期間持有；退避 sleep 時放掉，
+      連不上的裝置不會讓其他裝置的 connect 一起排隊等完整個重試預算
+    - 只重試 BleakError（BlueZ 暫時性錯誤）；timeout 多半是裝置不在，直接往上丟
+    - 回傳的可能是新的 client 物件（establish_connection 會自己建）
+    """
+    for attempt in range(BLE_CONNECT_RETRIES):
+        try:
+            async with BLE_CONNECT_SEM:
+                return await _connect_once(client, address)
+        except BleakError as e:
+            delay = BLE_CONNECT_BACKOFF_SEC * (2 ** attempt)
+            logging.warning(f"[{address}] Connect failed ({e}); retry in {delay:.1f}s")
+            await _quiet_disconnect(client)
+            await asyncio.sleep(delay)
+
+    # 最後一次：失敗就往上丟
+    async with BLE_CONNECT_SEM:
+        return await _connect_once(client, address)
+
+
+# ============================================================
+# BLE session pool (reuse connections across API calls)
+# ============================================================
+# 連線閒置多久就斷（秒）；0 = 不保留連線（用完就斷，等同舊行為）
+# 注意：連線中的裝置通常不再廣播；api_scan 會把池裡的裝置沿用上一份 cache 的 row（_keep_pooled_rows）
+BLE_SESSION_TTL_SEC = max(0.0, float(os.getenv("BLE_SESSION_TTL_SEC", "60")))
+
+
+async def _quiet_disconnect(client: BleakClient) -> None:
+    try:
+        await asyncio.wait_for(client.disconnect(), timeout=5.0)
+    except Exception:
+        pass
+
+
+def _spawn_disconnect(client: BleakClient) -> None:
+    """Fire-and-forget disconnect (peer is about to drop the link anyway)."""
+    _spawn_bg(_quiet_disconnect(client))
+
+
+class _BleSession:
+    __slots__ = ("client", "lock", "last_used", "discard")
+
+    def __init__(self, client: BleakClient) -> None:
+        self.client = client
+        self.lock = asyncio.Lock()   # BleakClient 不可重入：同一台一次一個操作
+        self.last_used = time.monotonic()
+        self.discard = False         # 用完就移出池（discard 在 acquire 區塊裡標記）
+
+
+class BleSessionPool:
+    """
+    address -> connected BleakClient, reused within BLE_SESSION_TTL_SEC.
+
+    - acquire：沒連線才 connect（_establish：BLE_CONNECT_SEM 限流 + 退避重試；再 profile settle），連著就直接用
+    - 同一台的操作用 per-session lock 串行
+    - 拿到 lock 後再確認 session 還在池裡：排隊期間被 evict / discard / drop 的話，
+      改用（或新建）池裡現在那一個，不在孤兒 session 上重連（否則同一台會有兩個 BleakClient）
+    - 操作中丟例外：連線狀態不可信，直接丟掉這個 session（斷線）
+    - 區塊裡呼叫 discard：離開時移出池，disconnect 丟背景（不等 round-trip / timeout）
+    - evict_idle_forever：背景把閒置超過 TTL 的 session 斷掉
+    """
+
+    def __init__(self, ttl_sec: float) -> None:
+        self._ttl = ttl_sec
+        self._sessions: Dict[str, _BleSession] = {}
+
+    def addresses(self) -> List[str]:
+        """Addresses that currently have a session（連線中或排隊中）."""
+        return list(self._sessions)
+
+    async def _lock_current(self, address: str) -> _BleSession:
+        """Lock and return the session currently registered for `address`（必要時新建）."""
+        while True:
+            sess = self._sessions.get(address)
+            if sess is None:
+                sess = self._sessions[address] = _BleSession(
+                    BleakClient(address, timeout=CONNECT_TIMEOUT_SEC)
+                )
+            await sess.lock.acquire()
+            if self._sessions.get(address) is sess:
+                return sess
+            sess.lock.release()
+
+    @asynccontextmanager
+    async def acquire(self, address: str, profile):
+        sess = await self._lock_current(address)
+        try:
+            client = sess.client
+            if not client.is_connected:
+                _forget_chars(client)
+                try:
+                    client = sess.client = await _establish(client, address)
+                except BaseException:
+                    # 連不上就不留在池裡（addresses() 只列真的有 session 的裝置）
+                    self._drop(address, sess)
+                    raise
+                await _settle(profile, "CONNECT_SETTLE_SEC")
+
+            try:
+                yield client
+            except BaseException:
+                self._drop(address, sess)
+                await _quiet_disconnect(client)
+                raise
+            finally:
+                sess.last_used = time.monotonic()
+
+            if sess.discard:
+                self._drop(address, sess)
+                _spawn_disconnect(client)
+            elif self._ttl <= 0:
+                self._drop(address, sess)
+                await _quiet_disconnect(client)
+        finally:
+            sess.lock.release()
+
+    def discard(self, address: str) -> None:
+        """
+        Drop `address` from the pool and disconnect in the background（例如 reset/reboot 後，peer 自己會斷）.
+
+        - 在 acquire 區塊裡呼叫：只做標記，離開區塊時由 acquire 移出池並丟背景 disconnect
+          （TTL=0 時也不會再 await disconnect 的 round-trip / timeout）
+        - 沒人在用：直接移出池，丟背景 disconnect
+        """
+        sess = self._sessions.get(address)
+        if sess is None:
+            return
+        if sess.lock.locked():
+            sess.discard = True
+            return
+        self._drop(address, sess)
+        _spawn_disconnect(sess.client)
+
+    def _drop(self, address: str, sess: _BleSession) -> None:
+        if self._sessions.get(address) is sess:
+            del self._sessions[address]
+        _forget_chars(sess.client)
+
+    async def evict_idle_forever(self) -> None:
+        """Background loop: disconnect sessions idle longer than TTL."""
+        while True:
+            await asyncio.sleep(max(1.0, self._ttl / 2))
+            now = time.monotonic()
+            for address, sess in list(self._sessions.items()):
+                if sess.lock.locked() or now - sess.last_used < self._ttl:
+                    continue
+                self._drop(address, sess)
+                await _quiet_disconnect(sess.client)
+
+    async def close_all(self) -> None:
+        for address, sess in list(self._sessions.items()):
+            self._drop(address, sess)
+            await _quiet_disconnect(sess.client)
+
+
+BLE_POOL = BleSessionPool(BLE_SESSION_TTL_SEC)
+_EVICT_TASK: Optional["asyncio.Task[None]"] = None
+
+
+@app.on_event("startup")
+async def _start_ble_pool():
+    global _EVICT_TASK
+    if BLE_SESSION_TTL_SEC > 0:
+        _EVICT_TASK = asyncio.create_task(BLE_POOL.evict_idle_forever())
+
+
+@app.on_event("shutdown")
+async def _close_ble_pool():
+    if _EVICT_TASK is not None:
+        _EVICT_TASK.cancel()
+    await BLE_POOL.close_all()
 
 
 # ============================================================
 # Routes: HTML
 # ============================================================
+INDEX_PATH = "/web/index.html"
+# index.html 執行期間不會變：startup 讀一次，之後直接回記憶體裡的 bytes
+_INDEX_HTML: Optional[bytes] = None
+
+
+def _load_index_html() -> bytes:
+    global _INDEX_HTML
+    if _INDEX_HTML is None:
+        with open(INDEX_PATH, "rb") as f:
+            _INDEX_HTML = f.read()
+    return _INDEX_HTML
+
+
+@app.on_event("startup")
+async def _preload_index_html():
+    """Read index.html once at startup（讀不到就留到第一次請求再試）."""
+    try:
+        _load_index_html()
+    except OSError as e:
+        logging.error(f"preload {INDEX_PATH} failed: {e}")
+
+
 @app.get("/", response_class=HTMLResponse)
-def index():
-    """Serve UI page."""
-    with open("/web/index.html", "r", encoding="utf-8") as f:
-        return f.read()
+async def index():
+    """Serve UI page (cached in memory; no disk I/O on the event loop)."""
+    return HTMLResponse(_load_index_html())
 
 
 # ============================================================
@@ -298,35 +1007,92 @@ class ProfileSelectRequest(BaseModel):
     id: str
 
 
-@app.get("/api/profiles")
-async def api_profiles_get():
-    """Get current profiles doc."""
+# profiles doc 的記憶體副本（copy-and-swap）
+# - reader 直接用它（不讀檔、不 deepcopy），拿到的 doc 只能讀不能改
+# - writer 用 copy_doc(load_profiles(...)) 拿一份新的 doc 改完、save 後整份換掉（rebind）
+CURRENT_DOC: Optional[Dict[str, Any]] = None
+
+
+def _current_doc() -> Dict[str, Any]:
+    """Return the in-memory profiles doc (loaded once on first use). Read-only."""
+    global CURRENT_DOC
+    if CURRENT_DOC is None:
+        CURRENT_DOC = load_profiles(PROFILE_FILE)
+    return CURRENT_DOC
+
+
+# /api/profiles 的回應 body + ETag，跟著 CURRENT_DOC 的 identity 走（copy-and-swap，換 doc 才重算）
+_PROFILES_BODY: Tuple[Any, bytes, str] = (None, b"", "")
+
+
+def _profiles_body() -> Tuple[bytes, str]:
+    """Return (JSON body, ETag) of the current profiles doc; serialized once per doc."""
+    global _PROFILES_BODY
+    doc = _current_doc()
+    if _PROFILES_BODY[0] is not doc:
+        body = orjson.dumps(export_doc(doc))
+        _PROFILES_BODY = (doc, body, _etag_of(body))
+    return _PROFILES_BODY[1], _PROFILES_BODY[2]
+
+
+def _commit_doc(doc: Dict[str, Any]) -> None:
+    """Persist `doc` (debounced) and swap it in as CURRENT_DOC. Call under PROFILE_LOCK."""
+    global CURRENT_DOC
+    save_profiles(doc, PROFILE_FILE)
+    CURRENT_DOC = doc
+
+
+@app.on_event("shutdown")
+async def _flush_profiles_on_shutdown():
+    """save_profiles 會 debounce；關機前把最新內容 durable 落盤。
+
+    - 平常的 debounce 寫入不 fsync（省 SD 卡），關機這次要確定真的寫到媒體上
+    - durable 寫入會取代還在等的 pending snapshot，flush task 醒來看到沒 pending 就結束
+    """
     async with PROFILE_LOCK:
-        doc = load_profiles(PROFILE_FILE)
-        return doc
+        if CURRENT_DOC is None:
+            flush_profiles_sync()
+        else:
+            save_profiles_durable(CURRENT_DOC, PROFILE_FILE)
+
+
+@app.get("/api/profiles")
+async def api_profiles_get(request: Request):
+    """
+    Get current profiles doc.
+
+    - body 每份 doc 只序列化一次（_profiles_body）；帶 ETag
+    - If-None-Match 相符：回 304，不送 body
+    """
+    body, etag = _profiles_body()
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+    return Response(body, media_type="application/json", headers={"ETag": etag})
 
 
 @app.post("/api/profiles/upsert")
 async def api_profiles_upsert(req: ProfileUpsertRequest):
     """Upsert a profile and persist it."""
     async with PROFILE_LOCK:
-        doc = load_profiles(PROFILE_FILE)
+        doc = copy_doc(load_profiles(PROFILE_FILE))
         ok, pid_or_err = upsert_profile(doc, req.profile, req.overwrite_id)
         if not ok:
             return {"ok": False, "error": pid_or_err}
-        save_profiles(doc, PROFILE_FILE)
-        return {"ok": True, "id": pid_or_err, "doc": doc}
+        _commit_doc(doc)
+        # 覆蓋掉的舊憑證可能還留在 encode 快取裡
+        _encode_write_payload.cache_clear()
+        return {"ok": True, "id": pid_or_err, "doc": export_doc(doc)}
 
 
 @app.post("/api/profiles/select")
 async def api_profiles_select(req: ProfileSelectRequest):
     """Set current_profile_id."""
     async with PROFILE_LOCK:
-        doc = load_profiles(PROFILE_FILE)
+        doc = copy_doc(load_profiles(PROFILE_FILE))
         ok, pid_or_err = set_current_profile(doc, req.id)
         if not ok:
             return {"ok": False, "error": pid_or_err}
-        save_profiles(doc, PROFILE_FILE)
+        _commit_doc(doc)
         return {"ok": True, "id": pid_or_err}
 
 
@@ -334,75 +1100,148 @@ async def api_profiles_select(req: ProfileSelectRequest):
 async def api_profiles_delete(profile_id: str):
     """Delete a profile by id."""
     async with PROFILE_LOCK:
-        doc = load_profiles(PROFILE_FILE)
+        doc = copy_doc(load_profiles(PROFILE_FILE))
         ok = delete_profile(doc, profile_id)
         if not ok:
             return {"ok": False, "error": "Profile 不存在或 id 空"}
-        save_profiles(doc, PROFILE_FILE)
-        return {"ok": True, "doc": doc}
+        _commit_doc(doc)
+        # 被刪的 profile 可能還留著 encode 過的 wifi 密碼
+        _encode_write_payload.cache_clear()
+        return {"ok": True, "doc": export_doc(doc)}
 
 
 # ============================================================
 # Routes: Scan + cache
 # ============================================================
+# list 超過這個長度就改用 chunked 串流輸出（一次只 dumps STREAM_CHUNK_ITEMS 筆）
+STREAM_MIN_ITEMS = 500
+STREAM_CHUNK_ITEMS = 100
+
+
+def _stream_json_list(head: Dict[str, Any], key: str, items: List[Any]):
+    """
+    Yield `{**head, key: items}` as JSON bytes, a chunk of items at a time.
+
+    - head 必須非空（用它的 "{...}" 去掉結尾 "}" 接上 list）
+    - 峰值記憶體只有一個 chunk，不是整份回應
+    """
+    yield orjson.dumps(head)[:-1] + b',' + orjson.dumps(key) + b':['
+    for i in range(0, len(items), STREAM_CHUNK_ITEMS):
+        chunk = orjson.dumps(items[i:i + STREAM_CHUNK_ITEMS])[1:-1]
+        yield chunk if i == 0 else b',' + chunk
+    yield b']}'
+
+
+def _keep_pooled_rows(results: List[ScanRow]) -> List[Any]:
+    """
+    Rows of pooled (connected / in-use) devices that this scan missed, taken from the previous cache.
+
+    連線中的裝置通常不廣播：不補回來的話，新的 cache 裡就沒有它，
+    之後 write_profile / send_command 查不到 adv name 會被當成不支援
+    """
+    prev = _SCAN_CACHE["by_addr"]
+    if not prev:
+        return []
+    seen = {r["address"] for r in results}
+    return [prev[a] for a in BLE_POOL.addresses() if a not in seen and a in prev]
+
+
 @app.post("/api/scan")
-async def api_scan():
+async def api_scan(quick: bool = False, force_refresh: bool = False, full: bool = False):
     """
     Scan BLE devices and save results to cache.
 
+    - quick=True：看到第一台支援的裝置就結束（單台配網常用）
+    - force_refresh=True：不用常駐 scanner 的舊快照，重新收一輪 ADV
+    - full=True：每台都帶 manufacturer_data（預設只有 ZP2 / 支援的裝置帶）
+
     回傳：
     - results: scan 即時結果
-    - cache: 同時落盤到 /data/scan_cache.json
+    - cache: 立即更新記憶體 cache，背景落盤到 /data/scan_cache.json
     """
-    results = await do_scan()
+    results = await do_scan(
+        stop_on_supported=quick,
+        force_refresh=force_refresh,
+        include_manufacturer_data=full,
+    )
     payload = {
         "ts": int(time.time()),
         "timeout_sec": SCAN_TIMEOUT_SEC,
+        # 算一次存進 cache，/api/devices 直接讀
+        "zp2_count": sum(1 for r in results if r["is_zp2"]),
         "results": results,
     }
-    save_json(CACHE_PATH, payload)
+    kept = _keep_pooled_rows(results)
+    if kept:
+        payload["results"] = results = results + kept
+        payload["zp2_count"] += sum(1 for r in kept if r.get("is_zp2"))
+    _set_scan_cache(payload)
+    _write_scan_cache_behind(payload)
 
     return {
         "ok": True,
         "count": len(results),
-        "zp2_count": sum(1 for r in results if r["is_zp2"]),
+        "zp2_count": payload["zp2_count"],
         "results": results,
     }
 
 
 @app.get("/api/devices")
-def api_devices(only_zp2: bool = True):
+async def api_devices(request: Request, only_zp2: bool = True):
     """
     Get devices from scan cache.
 
     - default only_zp2=True：符合你目前 UI/流程偏好
     - cache 超過 TTL：回傳 expired=True 並清空 cache
+    - 帶 ETag（scan cache 版本 + only_zp2）：裝置清單沒變就回 304
+      body 裡只放不會自己變的欄位：給 ts（scan 時間），age 由 client 用 now - ts 算，
+      不放每秒都在變的 age_sec，否則 304 會讓 client 的 age 永遠停在第一次拿到的值
     """
-    cache = load_json(CACHE_PATH, default={"ts": 0, "results": []})
+    # 記憶體查表；startup 已預載（_preload_scan_cache），這裡的 to_thread 只是保底
+    scan = _SCAN_CACHE if _SCAN_CACHE["payload"] is not None else await asyncio.to_thread(_get_scan_cache)
+    cache = scan["payload"]
     ts = int(cache.get("ts", 0) or 0)
     age = int(time.time()) - ts
 
     if ts == 0 or age > SCAN_CACHE_TTL_SEC:
-        save_json(CACHE_PATH, {"ts": 0, "timeout_sec": SCAN_TIMEOUT_SEC, "results": []})
+        if ts != 0:  # 已經是空的就不用再清
+            empty = {"ts": 0, "timeout_sec": SCAN_TIMEOUT_SEC, "results": []}
+            _set_scan_cache(empty)
+            _write_scan_cache_behind(empty)
+        # 跟未過期分支同一組欄位：ts 是過期那份 cache 的 scan 時間（沒 scan 過就是 0）
         return {
             "ok": True,
-            "age_sec": age,
+            "ts": ts,
             "ttl_sec": SCAN_CACHE_TTL_SEC,
             "expired": True,
             "devices": [],
         }
 
-    results = cache.get("results", [])
-    if only_zp2:
-        results = [r for r in results if r.get("is_zp2")]
+    # zp2 list 在 cache 變動時才重建（_get_scan_cache）
+    zp2 = scan["zp2"]
+    zp2_count = cache.get("zp2_count")
+    if zp2_count is None:  # 舊版 cache 沒存
+        zp2_count = len(zp2)
+    results = zp2 if only_zp2 else cache.get("results", [])
 
-    return {
+    etag = f'"{_BOOT_ID}-{scan["gen"]}-{int(only_zp2)}"'
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    head = {
         "ok": True,
-        "age_sec": age,
+        "ts": ts,
         "ttl_sec": SCAN_CACHE_TTL_SEC,
         "expired": False,
-        "devices": results,
+        "zp2_count": zp2_count,
     }
+    headers = {"ETag": etag}
+    if len(results) > STREAM_MIN_ITEMS:
+        return StreamingResponse(
+            _stream_json_list(head, "devices", results), media_type="application/json", headers=headers
+        )
+    head["devices"] = results
+    return ORJSONResponse(head, headers=headers)
 
 
 # ============================================================
@@ -425,94 +1264,113 @@ class CommandBody(BaseModel):
     targets: List[str]
     command: str  # "reset" or "reboot"
 
+# ============================================================
+# BLE helper: bounded worker pool over targets
+# ============================================================
+async def _run_workers(targets: List[str], handle_one) -> List[Any]:
+    """
+    Run `await handle_one(address)` for every target with at most BLE_WORKERS in flight.
+
+    - 不再一次把 N 台都丟進 gather：queue + 固定數量 worker，adapter 不會被一次塞爆
+    - 回傳順序與 targets 相同
+    """
+    queue: "asyncio.Queue[Any]" = asyncio.Queue()
+    for i, address in enumerate(targets):
+        queue.put_nowait((i, address))
+
+    results: List[Any] = [None] * len(targets)
+
+    async def worker() -> None:
+        while not queue.empty():
+            i, address = queue.get_nowait()
+            results[i] = await handle_one(address)
+
+    await asyncio.gather(*[worker() for _ in range(min(BLE_WORKERS, len(targets)))])
+    return results
+
+
+# fetch_details 每台的欄位；失敗時用 dict.fromkeys 一次建好空字串骨架
+_DETAIL_FIELDS = ("mode", "ssid", "mqtt", "ip", "model", "fw_version")
+
+
+def _fetch_error_item(address: str, error: str) -> Dict[str, Any]:
+    """Result skeleton for a failed fetch_one（欄位順序與成功時相同）."""
+    item: Dict[str, Any] = {"address": address, "ok": False, "error": error}
+    item.update(dict.fromkeys(_DETAIL_FIELDS, ""))
+    return item
+
+
 # ============================================================
 # BLE helper: fetch one device (connect serialized, reads concurrent-limited)
 # ============================================================
 async def fetch_one(
     address: str,
     profile_getter_func=get_profile_by_adv_name,
+    adv_name: Optional[str] = None,
+    profile=None,
 ) -> Dict[str, Any]:
     """單一裝置的讀取任務
 
     策略：
-    - connect 階段：使用 BLE_CONNECT_LOCK 強制排隊，避免 BlueZ/DBus 的 InProgress 類錯誤
+    - connect 階段：使用 BLE_CONNECT_SEM 限制同時連線數（預設 1），避免 BlueZ/DBus 的 InProgress 類錯誤
     - read 階段：使用 MAX_CONCURRENT_BLE 做總體併發限制（已連線後才拿票）
-    - 單台裝置內：依序 read，不用 gather，降低同裝置 InProgress 機率
-    """
-    item: Dict[str, Any] = {
-        "address": address,
-        "ok": False,
-        "error": None,
-        "mode": "",
-        "ssid": "",
-        "mqtt": "",
-        "ip": "",
-        "model": "",
-        "fw_version": "",
-    }
-
-    client: Optional[BleakClient] = None
+    - 單台裝置內：六個 read 用 gather 同時發（pipeline ATT request，省掉逐個等 RTT）；失敗的改逐個重讀
+    - adv_name / profile：呼叫端批次查好的（resolve_target_profiles）；沒給才自己查
+    """
+    item: Optional[Dict[str, Any]] = None
     try:
-        adv_name = find_adv_name_in_cache(address)
-        profile = profile_getter_func(adv_name)
+        if adv_name is None:
+            adv_name = find_adv_name_in_cache(address)
+        if profile is None:
+            profile = profile_getter_func(adv_name)
         if profile is None:
             raise RuntimeError(f"unsupported device by adv name: '{adv_name}'")
 
-        client = BleakClient(address, timeout=CONNECT_TIMEOUT_SEC)
-
         # ------------------------------
-        # 1) Connect：嚴格排隊
+        # 1) Connect：連線池（沒連線才 connect，BLE_CONNECT_SEM 限流）
         # ------------------------------
-        async with BLE_CONNECT_LOCK:
-            logging.info(f"[{address}] Connecting...")
-            await client.connect()
-            # 保險：避免偶發 services 還沒 resolved
-            await asyncio.sleep(0.3)
-
-        # ------------------------------
-        # 2) Read：已連線後才做總體併發限制
-        # ------------------------------
-        async with MAX_CONCURRENT_BLE:
-            logging.info(f"[{address}] Fetching data...")
-
-            # --- READ raw ---
-            ip_b = await _read_in_service(client, profile.EP_IP.service, profile.EP_IP.char)
-            ssid_b = await _read_in_service(client, profile.EP_WIFI_COMBO.service, profile.EP_WIFI_COMBO.char)
-            mode_b = await _read_in_service(client, profile.EP_MODE.service, profile.EP_MODE.char)
-            mqtt_b = await _read_in_service(client, profile.EP_MQTT.service, profile.EP_MQTT.char)
-            model_b = await _read_in_service(client, profile.EP_MODEL.service, profile.EP_MODEL.char)
-            fw_b = await _read_in_service(client, profile.EP_FW_VERSION.service, profile.EP_FW_VERSION.char)
-
-            # --- DECODE semantic ---
-            item.update({
-                "ok": True,
-                "mode": profile.decode_mode(mode_b),
-                # 這顆其實是 combo（ssid pwd）；目前 UI 只展示 ssid，先沿用既有行為
-                "ssid": profile.decode_text(ssid_b),
-                "mqtt": profile.decode_mqtt(mqtt_b),
-                "ip": profile.decode_ip(ip_b),
-                "model": profile.decode_model(model_b),
-                "fw_version": profile.decode_fw_version(fw_b),
-            })
-
-            logging.info(f"[{address}] Done.")
+        async with BLE_POOL.acquire(address, profile) as client:
+            # ------------------------------
+            # 2) Read：已連線後才做總體併發限制
+            # ------------------------------
+            async with MAX_CONCURRENT_BLE:
+                logging.info(f"[{address}] Fetching data...")
+
+                # --- READ raw（六個 read 一起發，讓 stack 在同一個連線間隔內排多個 ATT request）---
+                eps = (
+                    profile.EP_IP,
+                    profile.EP_WIFI_COMBO,
+                    profile.EP_MODE,
+                    profile.EP_MQTT,
+                    profile.EP_MODEL,
+                    profile.EP_FW_VERSION,
+                )
+                ip_b, ssid_b, mode_b, mqtt_b, model_b, fw_b = await _read_endpoints(client, address, eps)
+
+                # --- DECODE semantic（成功就直接建完整結果，不先建空殼再 update）---
+                item = {
+                    "address": address,
+                    "ok": True,
+                    "error": None,
+                    "mode": profile.decode_mode(mode_b),
+                    # 這顆其實是 combo（ssid pwd）；目前 UI 只展示 ssid，先沿用既有行為
+                    "ssid": profile.decode_text(ssid_b),
+                    "mqtt": profile.decode_mqtt(mqtt_b),
+                    "ip": profile.decode_ip(ip_b),
+                    "model": profile.decode_model(model_b),
+                    "fw_version": profile.decode_fw_version(fw_b),
+                }
+
+                logging.info(f"[{address}] Done.")
 
     except asyncio.CancelledError:
-        item["error"] = "cancelled"
         logging.warning(f"[{address}] Cancelled.")
         raise
     except Exception as e:
-        item["error"] = str(e)
+        item = _fetch_error_item(address, str(e))
         logging.error(f"[{address}] Error: {e}")
-    finally:
-        if client is not None and client.is_connected:
-            try:
-                # 避免 disconnect 卡死拖慢整批
-                await asyncio.wait_for(client.disconnect(), timeout=5.0)
-            except Exception:
-                pass
 
-    return item
+    return item if item is not None else _fetch_error_item(address, "no result")
 
 
 # ============================================================
@@ -524,13 +1382,108 @@ async def api_fetch_details(body: FetchDetailsBody):
     if not targets:
         return {"ok": True, "results": []}
 
-    # 雖然同時發起，但 connect 會被 BLE_CONNECT_LOCK 強制排隊
-    tasks = [fetch_one(addr, get_profile_by_adv_name) for addr in targets]
-    results = await asyncio.gather(*tasks)
+    # 最多 BLE_WORKERS 台同時進行；connect 仍受 BLE_CONNECT_SEM 限流
+    resolved = resolve_target_profiles(targets)
+    results = await _run_workers(
+        targets, lambda addr: fetch_one(addr, get_profile_by_adv_name, *resolved[addr])
+    )
     return {"ok": True, "results": results}
 
 
 
+# ============================================================
+# BLE helper: write profile to one device
+# ============================================================
+@lru_cache(maxsize=16)
+def _encode_write_payload(profile, mode: str, mqtt_in: str, ssid: str, password: str) -> Tuple[str, str, bytes, bytes, bytes]:
+    """
+    (profile, 使用者輸入) -> (mode_text, mqtt_text, mode_bytes, mqtt_bytes, wifi_payload)
+
+    - 只和 profile 與 user_profile 有關，跟是哪一台無關：批次寫 N 台同型號時只算一次
+    - 裡面有 wifi 密碼：profile upsert / 刪除時清掉（api_profiles_upsert / api_profiles_delete）
+    - 這是唯一一層 encode 快取：profile 的 encode_* 不自己快取，清這裡就清乾淨
+    """
+    mode_text = profile.encode_mode(mode)                     # str
+    mqtt_text = profile.encode_mqtt(mqtt_in)                  # str
+    wifi_payload = profile.encode_wifi_combo(ssid, password)  # bytes
+    return mode_text, mqtt_text, _encode_text(mode_text), _encode_text(mqtt_text), wifi_payload
+
+
+async def _write_one(
+    address: str,
+    adv_name: str,
+    profile,
+    mode: str,
+    ssid: str,
+    password: str,
+    mqtt_in: str,
+) -> Any:
+    """
+    單一裝置的寫入任務；回傳 (item, mode_text, mqtt_text)
+
+    - connect：BLE_CONNECT_SEM 限流；write：MAX_CONCURRENT_BLE 限制總體併發
+    - 單台裝置內：依序 write（MODE -> MQTT -> WIFI_COMBO），暫時性錯誤退避重試
+    """
+    item = {"address": address, "ok": False, "error": None}
+    mode_text = ""
+    mqtt_text = ""
+
+    try:
+        if profile is None:
+            raise RuntimeError(f"unsupported device by adv name: '{adv_name}'")
+
+        # profile 負責規格一致性（文字/拼接）；同一批 targets 同型號只 encode 一次
+        mode_text, mqtt_text, mode_b, mqtt_b, wifi_payload = _encode_write_payload(
+            profile, mode, mqtt_in, ssid, password
+        )
+
+        if not mqtt_text:
+            raise RuntimeError("profile.mqtt is empty")
+
+        async with BLE_POOL.acquire(address, profile) as client:
+            async with MAX_CONCURRENT_BLE:
+                # MODE / MQTT：endpoint 允許就走 write-without-response（不等 ATT_WRITE_RSP，省 RTT）
+                # MODE（文字 -> bytes）
+                ep = profile.EP_MODE
+                await _write_with_retry(
+                    client,
+                    ep.service,
+                    ep.char,
+                    mode_b,
+                    response=not getattr(ep, "allow_no_response", False)
+                )
+                await _settle(profile, "WRITE_SETTLE_SEC")
+
+                # MQTT（文字 -> bytes）
+                ep = profile.EP_MQTT
+                await _write_with_retry(
+                    client,
+                    ep.service,
+                    ep.char,
+                    mqtt_b,
+                    response=not getattr(ep, "allow_no_response", False)
+                )
+                await _settle(profile, "WRITE_SETTLE_SEC")
+
+                # WIFI_COMBO（已是 bytes）
+                # 最後一筆一定 response=True：當作 checkpoint，確認前面 write-without-response 都已送達
+                ep = profile.EP_WIFI_COMBO
+                await _write_with_retry(
+                    client,
+                    ep.service,
+                    ep.char,
+                    wifi_payload,
+                    response=True
+                )
+
+        item["ok"] = True
+
+    except Exception as e:
+        item["error"] = repr(e)
+
+    return item, mode_text, mqtt_text
+
+
 # ============================================================
 # Routes: write_profile
 # ============================================================
@@ -548,101 +1501,35 @@ async def api_write_profile(body: WriteProfileBody):
     # ------------------------------
     # 1) 讀取「使用者設定 profile」
     # ------------------------------
-    async with PROFILE_LOCK:
-        doc = load_profiles(PROFILE_FILE)
-        plist = doc.get("profiles", []) or []
-        user_profile = next((p for p in plist if str(p.get("id", "")) == pid), None)
+    user_profile = get_profile(_current_doc(), pid)
 
     if not user_profile:
         return {"ok": False, "error": f"profile not found: {pid}"}
 
-    mode = (user_profile.get("mode") or "").strip().upper()
-    ssid = (user_profile.get("ssid") or "").strip()
-    password = (user_profile.get("password") or "").strip()
-    mqtt_in = (user_profile.get("mqtt") or "").strip()
+    # Profile 已經 normalize 過（mode 大寫、欄位 strip）
+    mode = user_profile.mode
+    ssid = user_profile.ssid
+    password = user_profile.password
+    mqtt_in = user_profile.mqtt
 
-    results = []
+    # ⚠️ 保留原本行為：mqtt 空就整批直接 return（不改策略）
+    # 原本在迴圈內對 encode 結果判斷；encode_mqtt 只有輸入空才回空，提到 fan-out 前判斷即可
+    if not mqtt_in:
+        return {"ok": False, "error": "profile.mqtt is empty"}
+
+    # 最多 BLE_WORKERS 台同時進行；connect 仍受 BLE_CONNECT_SEM 限流（同 fetch_one）
+    resolved = resolve_target_profiles(targets)
+    outs = await _run_workers(
+        targets, lambda address: _write_one(address, *resolved[address], mode, ssid, password, mqtt_in)
+    )
+    results = [item for item, _, _ in outs]
 
     # 這兩個給 return 用（沿用你原本結構：回傳最後一台的值）
     mode_text = ""
     mqtt_text = ""
-
-    for address in targets:
-        item = {"address": address, "ok": False, "error": None}
-        client: Optional[BleakClient] = None
-
-        try:
-            adv_name = find_adv_name_in_cache(address)
-            profile = get_profile_by_adv_name(adv_name)
-            if profile is None:
-                raise RuntimeError(f"unsupported device by adv name: '{adv_name}'")
-
-            # profile 負責規格一致性（文字/拼接）
-            mqtt_text = profile.encode_mqtt(mqtt_in)      # str
-            mode_text = profile.encode_mode(mode)         # str
-            wifi_payload = profile.encode_wifi_combo(ssid, password)  # bytes
-
-            # ⚠️ 保留原本行為：mqtt 空就直接 return（不改策略）
-            if not mqtt_text:
-                return {"ok": False, "error": "profile.mqtt is empty"}
-
-            client = BleakClient(address, timeout=CONNECT_TIMEOUT_SEC)
-            await client.connect()
-            await asyncio.sleep(0.2)
-
-            # # MODE（文字 -> bytes）
-            # ep = profile.EP_MODE
-            # await _write_in_service(
-            #     client, ep.service, ep.char,
-            #     mqtt_text=None,  # placeholder, ignore
-            # )
-            # # ↑ 這行不要，下面是正確的（我留這個註解避免你 copy 錯）
-
-            ep = profile.EP_MODE
-            await _write_in_service(
-                client,
-                ep.service,
-                ep.char,
-                _encode_text(mode_text),
-                response=True
-            )
-            await asyncio.sleep(0.15)
-
-            # MQTT（文字 -> bytes）
-            ep = profile.EP_MQTT
-            await _write_in_service(
-                client,
-                ep.service,
-                ep.char,
-                _encode_text(mqtt_text),
-                response=True
-            )
-            await asyncio.sleep(0.15)
-
-            # WIFI_COMBO（已是 bytes）
-            ep = profile.EP_WIFI_COMBO
-            await _write_in_service(
-                client,
-                ep.service,
-                ep.char,
-                wifi_payload,
-                response=True
-            )
-            await asyncio.sleep(0.15)
-
-            item["ok"] = True
-
-        except Exception as e:
-            item["error"] = repr(e)
-
-        finally:
-            try:
-                if client is not None and client.is_connected:
-                    await client.disconnect()
-            except Exception:
-                pass
-
-        results.append(item)
+    for _, m_text, q_text in outs:
+        if m_text or q_text:
+            mode_text, mqtt_text = m_text, q_text
 
     return {
         "ok": True,
@@ -653,6 +1540,41 @@ async def api_write_profile(body: WriteProfileBody):
     }
 
 
+# ============================================================
+# BLE helper: send command to one device
+# ============================================================
+async def _command_one(address: str, adv_name: str, profile, cmd: str) -> Dict[str, Any]:
+    """單一裝置的 command 寫入任務（connect 排隊、write 限併發）"""
+    item = {"address": address, "ok": False, "error": None}
+
+    try:
+        if profile is None:
+            raise RuntimeError(f"unsupported device by adv name: '{adv_name}'")
+
+        cmd_text = profile.encode_command(cmd)  # str
+        payload = _encode_text(cmd_text)        # bytes
+
+        async with BLE_POOL.acquire(address, profile) as client:
+            async with MAX_CONCURRENT_BLE:
+                ep = profile.EP_COMMAND
+                await _write_in_service(
+                    client,
+                    ep.service,
+                    ep.char,
+                    payload,
+                    response=True
+                )
+            # reset/reboot 後裝置自己會斷線：標記丟棄，離開區塊時移出連線池、disconnect 丟背景，
+            # 不等它的 round-trip / timeout
+            BLE_POOL.discard(address)
+        item["ok"] = True
+
+    except Exception as e:
+        item["error"] = repr(e)
+
+    return item
+
+
 # ============================================================
 # Routes: send command (reset / reboot)
 # ============================================================
@@ -666,57 +1588,33 @@ async def api_send_command(body: CommandBody):
     if not targets:
         return {"ok": False, "error": "targets is empty"}
 
-    results = []
-
-    for address in targets:
-        item = {"address": address, "ok": False, "error": None}
-        client: Optional[BleakClient] = None
-
-        try:
-            client = BleakClient(address, timeout=CONNECT_TIMEOUT_SEC)
-            await client.connect()
-            await asyncio.sleep(0.2)
-
-            adv_name = find_adv_name_in_cache(address)
-            profile = get_profile_by_adv_name(adv_name)
-            if profile is None:
-                raise RuntimeError(f"unsupported device by adv name: '{adv_name}'")
-
-            cmd_text = profile.encode_command(cmd)  # str
-            payload = _encode_text(cmd_text)        # bytes
-
-            ep = profile.EP_COMMAND
-            await _write_in_service(
-                client,
-                ep.service,
-                ep.char,
-                payload,
-                response=True
-            )
-
-            item["ok"] = True
-
-        except Exception as e:
-            item["error"] = repr(e)
-
-        finally:
-            try:
-                if client is not None and client.is_connected:
-                    await client.disconnect()
-            except Exception:
-                pass
-
-        results.append(item)
-
+    # 最多 BLE_WORKERS 台同時進行；connect 仍受 BLE_CONNECT_SEM 限流（同 fetch_one）
+    resolved = resolve_target_profiles(targets)
+    results = await _run_workers(targets, lambda address: _command_one(address, *resolved[address], cmd))
     return {"ok": True, "command": cmd, "results": results}
 
 
 # ============================================================
 # Entrypoint
 # ============================================================
+def _server_impl(module: str) -> str:
+    """`module` if it is installed, else "auto"（沒裝 uvicorn[standard] 也能開機）."""
+    return module if importlib.util.find_spec(module) is not None else "auto"
+
+
 def main():
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8080)
+    # uvloop + httptools（uvicorn[standard]）：每次 await 的排程成本比 stdlib asyncio 低；沒裝就退回 auto
+    # workers=1：BLE adapter、scanner、connection pool 都是 process 內的單例，不能多 process 共用
+    # access_log=False：UI 輪詢的每個 request 不再各印一行；要看的事件 logging 本來就有記
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8080,
+        loop=_server_impl("uvloop"),
+        http=_server_impl("httptools"),
+        workers=1,
+        access_log=False,
+    )
 
 
 if __name__ == "__main__":